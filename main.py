@@ -28,32 +28,98 @@ Directory Structure:
     - preferences.json
     - subscription_urls.json
   - output/
-    - archive_proxies.json
+    - archive_proxies.jsonl
 
 Required Libraries:
 -------------------
 pip install requests qrcode[pil]
+pip install orjson  (optional, faster JSON parsing and serialization)
+pip install ijson   (optional, streams large subscription feeds)
+pip install pypng   (optional, alternative QR code PNG encoder)
+
+Profiling:
+----------
+PROFILE=1 python main.py  (prints the top cProfile entries and saves the stats
+to prof.out, or to the path in PROFILE_OUTPUT)
 """
 
+import cProfile
 import json
 import logging
 import os
+import pstats
 import re
 import sys
 import time
 import io
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 try:
     import requests
+    import urllib3
+    from requests.adapters import HTTPAdapter
     import qrcode
+    from qrcode.image.pil import PilImage
     from PIL import Image
 except ImportError:
     print("Error: A required library is missing.")
     print("Please install all required libraries by running: pip install requests 'qrcode[pil]'")
     sys.exit(1)
 
+try:
+    import orjson
+
+    def _json_loads(data: bytes) -> Any:
+        """Parses JSON from raw bytes."""
+        return orjson.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        """Serializes an object to compact UTF-8 JSON bytes for on-disk files."""
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def _json_dumps_str(obj: Any) -> str:
+        """Serializes an object to a compact JSON string for API payloads."""
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    def _json_loads(data: bytes) -> Any:
+        """Parses JSON from raw bytes."""
+        return json.loads(data)
+
+    def _json_dumps(obj: Any) -> bytes:
+        """Serializes an object to compact UTF-8 JSON bytes for on-disk files."""
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def _json_dumps_str(obj: Any) -> str:
+        """Serializes an object to a compact JSON string for API payloads."""
+        return json.dumps(obj)
+
+try:
+    import ijson
+    _JSON_STREAM_ERROR = ijson.JSONError
+except ImportError:
+    ijson = None
+    _JSON_STREAM_ERROR = json.JSONDecodeError
+
+try:
+    from qrcode.image.pure import PyPNGImage
+except ImportError:
+    PyPNGImage = None
+
+# Translation table that strips invalid characters from proxy secrets and links.
+_CLEAN_TABLE = str.maketrans('', '', '@!#$%^&*()+:"\'[]{}')
+# Characters that must be escaped in Telegram MarkdownV2 text.
+_MDV2_CHARS = '_*[]()~`>#+-=|{}.!\\'
+_MDV2_ESCAPE_RE = re.compile('([' + re.escape(_MDV2_CHARS) + '])')
+
+@lru_cache(maxsize=4096)
+def _escape_mdv2(text: str) -> str:
+    """Escapes MarkdownV2 special characters, caching repeated values such as country names."""
+    return _MDV2_ESCAPE_RE.sub(r'\\\1', text)
+
 # ================================================================
 # 1. LOGGER SETUP
 # ================================================================
@@ -111,8 +177,7 @@ class ConfigManager:
             sys.exit(1)
 
         try:
-            with self.config_path.open('r', encoding='utf-8') as f:
-                self.config = json.load(f)
+            self.config = _json_loads(self.config_path.read_bytes())
         except json.JSONDecodeError as e:
             self.log.critical(f"Error parsing '{self.config_path}': {e}. Aborting.")
             sys.exit(1)
@@ -168,13 +233,61 @@ class RuntimeManager:
         return False
 
 # ================================================================
-# 3. UTILITY CLASSES (QRCODE GENERATOR)
+# 3. UTILITY CLASSES (QRCODE GENERATOR & ARCHIVE)
 # ================================================================
 
 class QRCodeGenerator:
     """Generates QR code images from text data in memory."""
+    # Representative proxy link used to time the available PNG encoders.
+    BENCHMARK_DATA = "tg://proxy?server=255.255.255.255&port=65535&secret=ee" + "0" * 64
+    BENCHMARK_ROUNDS = 3
+
     def __init__(self, log: logging.Logger):
         self.log = log
+        self.image_factory, self.save_options = self._select_image_factory()
+
+    def _render(self, data: str, image_factory: Any, save_options: Dict[str, Any]) -> io.BytesIO:
+        """Renders a QR code with the given image factory into a PNG buffer."""
+        # Proxy links are short, so low error correction and small modules keep
+        # the PNG (and the upload) small while remaining easy to scan.
+        qr = qrcode.QRCode(
+            error_correction=qrcode.constants.ERROR_CORRECT_L, box_size=4, border=2, image_factory=image_factory
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        img_buffer = io.BytesIO()
+        qr.make_image().save(img_buffer, **save_options)
+        img_buffer.seek(0)  # Rewind the buffer to the beginning
+        return img_buffer
+
+    def _select_image_factory(self) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Times each available PNG encoder on a sample link and picks the fastest.
+
+        PIL is always available; qrcode's pure-Python PyPNG writer is also tried
+        when pypng is installed, since it can be faster for 1-bit images on some hosts.
+        """
+        candidates = [("PIL", PilImage, {'format': 'PNG', 'optimize': True})]
+        if PyPNGImage is not None:
+            candidates.append(("PyPNG", PyPNGImage, {}))
+
+        timings: Dict[str, float] = {}
+        for name, image_factory, save_options in candidates:
+            try:
+                self._render(self.BENCHMARK_DATA, image_factory, save_options)  # Warm up lazy imports.
+                start = time.perf_counter()
+                for _ in range(self.BENCHMARK_ROUNDS):
+                    self._render(self.BENCHMARK_DATA, image_factory, save_options)
+                timings[name] = time.perf_counter() - start
+            except Exception as e:
+                self.log.debug(f"QR code image backend '{name}' is unavailable: {e}")
+
+        if not timings:
+            return PilImage, candidates[0][2]
+        fastest = min(timings, key=timings.get)
+        self.log.info(f"Using the {fastest} backend for QR code images.")
+        _, image_factory, save_options = next(c for c in candidates if c[0] == fastest)
+        return image_factory, save_options
 
     def generate(self, data: str) -> Optional[io.BytesIO]:
         """
@@ -190,15 +303,75 @@ class QRCodeGenerator:
             return None
             
         try:
-            qr_image = qrcode.make(data, border=2)
-            img_buffer = io.BytesIO()
-            qr_image.save(img_buffer, format='PNG')
-            img_buffer.seek(0)  # Rewind the buffer to the beginning
-            return img_buffer
+            return self._render(data, self.image_factory, self.save_options)
         except Exception as e:
             self.log.error(f"Failed to generate QR code for data '{data[:30]}...': {e}")
             return None
 
+@dataclass
+class Archive:
+    """The links of previously posted proxies, loaded once per run and shared by the pipeline stages."""
+    path: Path
+    links: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path, log: logging.Logger) -> "Archive":
+        """Migrates a legacy archive if needed, then loads the archived links."""
+        cls._migrate_legacy(path, log)
+        return cls(path, cls._read_links(path, log))
+
+    @staticmethod
+    def _migrate_legacy(path: Path, log: logging.Logger):
+        """Converts a legacy JSON list archive next to the configured path into JSON Lines."""
+        legacy_path = path.with_suffix('.json')
+        if legacy_path == path or not legacy_path.exists() or path.exists():
+            return
+
+        log.info(f"Migrating legacy archive '{legacy_path}' to '{path}'...")
+        try:
+            legacy_proxies = _json_loads(legacy_path.read_bytes())
+        except (json.JSONDecodeError, IOError) as e:
+            log.error(f"Could not read legacy archive file '{legacy_path}': {e}")
+            return
+
+        # Write to a temporary file and swap it in so a crash never leaves a partial archive.
+        temp_path = path.with_suffix(path.suffix + '.tmp')
+        try:
+            temp_path.write_bytes(b''.join(_json_dumps(p) + b'\n' for p in legacy_proxies if p.get('tg_link')))
+            os.replace(temp_path, path)
+            legacy_path.unlink()
+            log.info(f"Migrated {len(legacy_proxies)} proxies to the JSON Lines archive.")
+        except IOError as e:
+            log.error(f"Failed to migrate legacy archive file '{legacy_path}': {e}")
+            temp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _read_links(path: Path, log: logging.Logger) -> Set[str]:
+        """Loads the set of previously posted proxy links from the archive file."""
+        log.info(f"Loading archive from '{path}'...")
+        if not path.exists():
+            log.warning("Archive file not found. Starting with an empty archive.")
+            return set()
+        try:
+            archived_links: Set[str] = set()
+            with path.open('rb') as f:
+                # The archive is JSON Lines, so entries are parsed one at a time.
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        link = _json_loads(line).get('tg_link')
+                    except (json.JSONDecodeError, AttributeError):
+                        log.warning(f"Skipping malformed archive entry on line {line_number}.")
+                        continue
+                    if link:
+                        archived_links.add(link)
+            log.info(f"Loaded {len(archived_links)} unique proxies from archive.")
+            return archived_links
+        except IOError as e:
+            log.error(f"Could not load or parse archive file '{path}': {e}")
+            return set()
+
 # ================================================================
 # 4. DATA LOADER
 # ================================================================
@@ -210,34 +383,56 @@ class DataLoader:
         self.log = log
         self.runtime = runtime
         self.initial_source_path = Path(self.config['paths']['subscriptions'])
+        self.max_workers = self.config.get('runtime', {}).get('fetch_workers', 16)
+        # A shared session keeps HTTPS connections alive across sources on the same host.
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
     def _fetch_from_url(self, url: str) -> List[Dict[str, Any]]:
         """Fetches and parses a JSON list of proxies from a single URL."""
         self.log.info(f"Fetching proxies from URL: {url}")
         try:
             timeout = self.config.get('runtime', {}).get('request_timeout', 30)
-            response = requests.get(url, timeout=timeout)
-            response.raise_for_status()
-            proxies_from_url = response.json()
+            with self.session.get(url, timeout=timeout, stream=ijson is not None) as response:
+                response.raise_for_status()
+                proxies_from_url = self._parse_json_response(response)
             if isinstance(proxies_from_url, list):
                 self.log.info(f"Fetched {len(proxies_from_url)} proxies from {url}")
                 return proxies_from_url
             else:
                 self.log.warning(f"Expected a JSON list from {url}, but got {type(proxies_from_url)}. Skipping.")
                 return []
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
             self.log.error(f"Error fetching from {url}: {e}")
             return []
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, _JSON_STREAM_ERROR):
             self.log.error(f"Failed to decode JSON from {url}.")
             return []
 
+    def _parse_json_response(self, response: requests.Response) -> Any:
+        """
+        Parses the JSON body of a response.
+
+        When ijson is available the body is streamed and a top-level list is built
+        item by item, so the raw payload is never buffered alongside the parsed
+        proxies. Otherwise the buffered body is parsed in one go.
+        """
+        if ijson is None:
+            return _json_loads(response.content)
+
+        response.raw.decode_content = True
+        events = ijson.parse(response.raw, use_float=True)
+        _, event, value = next(events)
+        if event != 'start_array':
+            # Only the type matters to the caller, which rejects non-list payloads.
+            return {} if event == 'start_map' else value
+        return list(ijson.items(events, 'item'))
+
     def _read_proxy_list_from_file(self, file_path: Path) -> List[Dict[str, Any]]:
         """Reads a file that is expected to contain a direct list of proxies."""
         self.log.info(f"Reading proxy list from local file: {file_path}")
         try:
-            with file_path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = _json_loads(file_path.read_bytes())
             if isinstance(data, list):
                 self.log.info(f"Read {len(data)} proxies from {file_path}")
                 return data
@@ -252,8 +447,7 @@ class DataLoader:
         """Reads a file that contains a list of subscription source strings."""
         self.log.info(f"Reading subscription sources from config file: {file_path}")
         try:
-            with file_path.open('r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = _json_loads(file_path.read_bytes())
             if isinstance(data, dict) and "subscriptions" in data and isinstance(data["subscriptions"], list):
                 return data["subscriptions"]
             else:
@@ -263,6 +457,34 @@ class DataLoader:
             self.log.error(f"Could not read or parse sources file '{file_path}': {e}")
             return []
 
+    def _fetch_from_urls(self, urls: Dict[int, str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Fetches several URLs concurrently.
+
+        Args:
+            urls: A mapping of source index to URL.
+
+        Returns:
+            A mapping of source index to the proxies fetched from that URL. Sources
+            that were not fetched before the time limit was reached are omitted.
+        """
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        if self.runtime.is_time_exceeded():
+            self.log.warning("Stopping data loading due to execution time limit.")
+            return results
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(urls))))
+        try:
+            futures = {executor.submit(self._fetch_from_url, url): index for index, url in urls.items()}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                if len(results) < len(futures) and self.runtime.is_time_exceeded():
+                    self.log.warning("Stopping data loading due to execution time limit.")
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return results
+
     def fetch_proxies(self) -> List[Dict[str, Any]]:
         """Public method to start the fetching process."""
         self.log.info("--- Stage: Data Loading ---")
@@ -278,18 +500,25 @@ class DataLoader:
         self.log.info(f"Found {len(sources)} sources to process.")
         all_proxies: List[Dict[str, Any]] = []
 
-        for source_str in sources:
+        url_sources = {
+            i: source_str for i, source_str in enumerate(sources)
+            if source_str.lower().startswith(('http://', 'https://'))
+        }
+        url_results = self._fetch_from_urls(url_sources) if url_sources else {}
+
+        # Assemble results in source order so deduplication stays deterministic.
+        for i, source_str in enumerate(sources):
+            if i in url_sources:
+                all_proxies.extend(url_results.get(i, []))
+                continue
             if self.runtime.is_time_exceeded():
                 self.log.warning("Stopping data loading due to execution time limit.")
                 break
-            if source_str.lower().startswith(('http://', 'https://')):
-                all_proxies.extend(self._fetch_from_url(source_str))
+            local_file_path = Path(source_str)
+            if local_file_path.exists() and local_file_path.is_file():
+                all_proxies.extend(self._read_proxy_list_from_file(local_file_path))
             else:
-                local_file_path = Path(source_str)
-                if local_file_path.exists() and local_file_path.is_file():
-                    all_proxies.extend(self._read_proxy_list_from_file(local_file_path))
-                else:
-                    self.log.warning(f"Local source file '{local_file_path}' not found. Skipping.")
+                self.log.warning(f"Local source file '{local_file_path}' not found. Skipping.")
 
         self.log.info(f"Total raw proxies fetched: {len(all_proxies)}")
         return all_proxies
@@ -299,62 +528,54 @@ class DataLoader:
 # ================================================================
 
 class ProxyProcessor:
-    """Handles loading the archive, cleaning secrets, and filtering proxies."""
-    def __init__(self, config: Dict[str, Any], log: logging.Logger):
+    """Handles cleaning secrets and filtering proxies against the archive."""
+    def __init__(self, config: Dict[str, Any], log: logging.Logger, archive: Archive):
         self.config = config
         self.log = log
-        self.archive_path = Path(self.config['paths']['archive'])
-        self.invalid_chars_pattern = r'[@!#$%^&*()+:"\'\[\]{}]'
-
-    def _load_archive(self) -> Set[str]:
-        """Loads the set of previously posted proxy links from the archive file."""
-        self.log.info(f"Loading archive from '{self.archive_path}'...")
-        if not self.archive_path.exists():
-            self.log.warning("Archive file not found. Starting with an empty archive.")
-            return set()
-        try:
-            with self.archive_path.open('r', encoding='utf-8') as f:
-                archive_data = json.load(f)
-            archived_links = {proxy.get('tg_link') for proxy in archive_data if proxy.get('tg_link')}
-            self.log.info(f"Loaded {len(archived_links)} unique proxies from archive.")
-            return archived_links
-        except (json.JSONDecodeError, IOError) as e:
-            self.log.error(f"Could not load or parse archive file '{self.archive_path}': {e}")
-            return set()
+        self.archive = archive
 
     def _clean_string(self, input_string: str) -> str:
         """Removes invalid characters from a string."""
-        if not isinstance(input_string, str):
-            return ""
-        return re.sub(self.invalid_chars_pattern, '', input_string)
+        return input_string.translate(_CLEAN_TABLE) if isinstance(input_string, str) else ""
 
     def find_new_proxies(self, fetched_proxies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Cleans secrets and filters the list of fetched proxies against the archive."""
         self.log.info("--- Stage: Processing and Filtering Proxies ---")
-        archived_links = self._load_archive()
+        archived_links = self.archive.links
         new_proxies: List[Dict[str, Any]] = []
-        seen_links_in_this_run: Set[str] = set()
 
-        for proxy in fetched_proxies:
+        # Archived links are stored in their cleaned form, so a raw link that already
+        # matches one was posted before and can be dropped without cleaning it.
+        candidates = [
+            proxy for proxy in fetched_proxies
+            if not (isinstance(proxy.get("tg_link"), str) and proxy["tg_link"] in archived_links)
+        ]
+        self.log.info(f"Skipped {len(fetched_proxies) - len(candidates)} already archived proxies before cleaning.")
+
+        # Links already archived or accepted earlier in this run, checked with a single lookup.
+        known_links = set(archived_links)
+
+        for proxy in candidates:
             # --- Step 1: Clean the secret field ---
             original_secret = proxy.get("secret")
             if original_secret:
                 proxy["secret"] = self._clean_string(original_secret)
             
-            # --- Step 2: Clean the entire tg_link field ---
-            original_tg_link = proxy.get("tg_link")
-            if original_tg_link:
-                proxy["tg_link"] = self._clean_string(original_tg_link)
-
-            # --- Step 3: Rebuild tg_link from components to ensure consistency ---
+            # --- Step 2: Rebuild tg_link from components to ensure consistency ---
             ip = proxy.get("ip")
             port = proxy.get("port")
             secret = proxy.get("secret")
+            original_tg_link = proxy.get("tg_link")
             if ip and port and secret:
+                # The rebuilt link replaces the supplied one, so there is no need to clean it first.
                 rebuilt_link = f"tg://proxy?server={ip}&port={port}&secret={secret}"
-                if rebuilt_link != proxy.get("tg_link"):
+                if rebuilt_link != original_tg_link:
                     self.log.debug(f"Rebuilt tg_link for proxy {ip} to ensure consistency.")
                     proxy["tg_link"] = rebuilt_link
+
+            # --- Step 3: Otherwise clean the entire tg_link field ---
+            elif original_tg_link:
+                proxy["tg_link"] = self._clean_string(original_tg_link)
             
             # --- Step 4: Continue with filtering logic using the cleaned link ---
             final_tg_link = proxy.get("tg_link")
@@ -362,9 +583,9 @@ class ProxyProcessor:
                 self.log.debug(f"Skipping proxy with no valid 'tg_link': {proxy}")
                 continue
             
-            if final_tg_link not in archived_links and final_tg_link not in seen_links_in_this_run:
+            if final_tg_link not in known_links:
                 new_proxies.append(proxy)
-                seen_links_in_this_run.add(final_tg_link)
+                known_links.add(final_tg_link)
 
         self.log.info(f"Found {len(new_proxies)} new, unique proxies to post after cleaning and filtering.")
         return new_proxies
@@ -383,29 +604,53 @@ class TelegramPoster:
         self.bot_token = self.config['telegram']['bot_token']
         self.channel_id = self.config['telegram']['channel_id']
         self.api_url = f"https://api.telegram.org/bot{self.bot_token}"
+        # Reuse one keep-alive connection to the Bot API across all chunks.
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=4))
 
     def _escape_markdown_v2(self, text: str) -> str:
         """Escapes MarkdownV2 special characters."""
-        escape_chars = r'_*[]()~`>#+-=|{}.!'
-        return re.sub(r'([%s])' % re.escape(escape_chars), r'\\\1', str(text))
+        return _escape_mdv2(text if isinstance(text, str) else str(text))
+
+    def _generate_qr_codes(self, proxies_chunk: List[Dict[str, Any]]) -> List[Optional[io.BytesIO]]:
+        """
+        Generates the QR codes for a chunk of proxies concurrently.
 
-    def _post_chunk_with_qrcodes(self, proxies_chunk: List[Dict[str, Any]]) -> bool:
+        Returns:
+            A list aligned with the chunk holding each proxy's PNG buffer, or None
+            where the proxy has no link or generation failed.
+        """
+        if not proxies_chunk:
+            return []
+        links = [proxy.get('tg_link') for proxy in proxies_chunk]
+        max_workers = min(len(links), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.qr_generator.generate, links))
+
+    def _post_chunk_with_qrcodes(
+        self, proxies_chunk: List[Dict[str, Any]], qr_buffers: Optional[List[Optional[io.BytesIO]]] = None
+    ) -> bool:
         """
         Posts a chunk of proxies by sending a media group with QR codes, then
         replying to it with a message containing the full details and inline keyboard.
+
+        Args:
+            proxies_chunk: The proxies to post together.
+            qr_buffers: QR codes already generated for the chunk, if any.
         """
         if not proxies_chunk:
             return False
 
         media_group = []
         files_to_upload = {}
+        if qr_buffers is None:
+            qr_buffers = self._generate_qr_codes(proxies_chunk)
         
-        for i, proxy in enumerate(proxies_chunk):
+        for i, (proxy, qr_buffer) in enumerate(zip(proxies_chunk, qr_buffers)):
             tg_link = proxy.get('tg_link')
             if not tg_link:
                 continue
 
-            qr_buffer = self.qr_generator.generate(tg_link)
             if not qr_buffer:
                 self.log.warning(f"Skipping proxy due to QR code generation failure: {tg_link}")
                 continue
@@ -421,10 +666,10 @@ class TelegramPoster:
 
         # --- Step 1: Send the Media Group WITHOUT a caption ---
         send_media_url = f'{self.api_url}/sendMediaGroup'
-        media_payload = {'chat_id': self.channel_id, 'media': json.dumps(media_group)}
+        media_payload = {'chat_id': self.channel_id, 'media': _json_dumps_str(media_group)}
         
         try:
-            media_response = requests.post(send_media_url, data=media_payload, files=files_to_upload, timeout=45)
+            media_response = self.session.post(send_media_url, data=media_payload, files=files_to_upload, timeout=45)
             media_response.raise_for_status()
             self.log.info(f"Successfully posted a media group of {len(proxies_chunk)} proxies.")
             
@@ -434,30 +679,22 @@ class TelegramPoster:
                 reply_to_message_id = response_data['result'][0]['message_id']
                 
                 # Build the full text for the reply message
-                caption_lines = []
-                for i, proxy in enumerate(proxies_chunk):
-                    ip_port = f"{proxy.get('ip', 'N/A')}:{proxy.get('port', 'N/A')}"
-                    display_name = proxy.get('country_name', proxy.get('country_code', 'NA'))
-                    country_flag = proxy.get('country_flag', '🏴‍☠️')
-                    tg_link = proxy.get('tg_link', '')
-                    ip_port_escaped = self._escape_markdown_v2(ip_port)
-                    tg_link_escaped = self._escape_markdown_v2(tg_link)
-                    address_line = f"🔒 *Address:* [{ip_port_escaped}]({tg_link_escaped})"
-                    country_line = f"🌎 *Country:* {country_flag} {self._escape_markdown_v2(display_name)}"
-                    caption_lines.append(address_line)
-                    caption_lines.append(country_line)
-                    if i < len(proxies_chunk) - 1:
-                        caption_lines.append("")
-                
+                esc = self._escape_markdown_v2
+                proxy_blocks = [
+                    f"🔒 *Address:* [{esc(p.get('ip', 'N/A'))}:{esc(p.get('port', 'N/A'))}]({esc(p.get('tg_link', ''))})\n"
+                    f"🌎 *Country:* {p.get('country_flag', '🏴‍☠️')} {esc(p.get('country_name', p.get('country_code', 'NA')))}"
+                    for p in proxies_chunk
+                ]
+                full_text = "\n\n".join(proxy_blocks)
+
                 channel_handle = self.config.get('posting', {}).get('channel_handle')
                 if channel_handle:
-                    caption_lines.append(f"\n{self._escape_markdown_v2(channel_handle)}")
-                full_text = "\n".join(caption_lines)
+                    full_text += f"\n\n{esc(channel_handle)}"
 
                 # Build the inline keyboard
                 inline_buttons = [{'text': "Connect", 'url': p['tg_link']} for p in proxies_chunk if p.get('tg_link')]
                 keyboard = [inline_buttons[i:i + 3] for i in range(0, len(inline_buttons), 3)]
-                reply_markup = json.dumps({'inline_keyboard': keyboard})
+                reply_markup = _json_dumps_str({'inline_keyboard': keyboard})
 
                 send_keys_url = f'{self.api_url}/sendMessage'
                 keys_payload = {
@@ -468,7 +705,7 @@ class TelegramPoster:
                     'reply_markup': reply_markup,
                     'disable_web_page_preview': True
                 }
-                keys_response = requests.post(send_keys_url, json=keys_payload, timeout=15)
+                keys_response = self.session.post(send_keys_url, json=keys_payload, timeout=15)
                 keys_response.raise_for_status()
                 self.log.info(f"Successfully sent details and inline keyboard as a reply.")
                 return True
@@ -493,27 +730,34 @@ class TelegramPoster:
         delay_seconds = self.config.get('posting', {}).get('delay_seconds', 600)
         
         posted_proxies: List[Dict[str, Any]] = []
-        
-        for i in range(0, len(proxies_to_post), proxies_per_post):
-            if self.runtime.is_time_exceeded():
-                self.log.warning("Stopping posting due to execution time limit.")
-                break
-                
-            chunk = proxies_to_post[i:i + proxies_per_post]
-            self.log.info(f"Processing chunk {i // proxies_per_post + 1}...")
-            
-            success = self._post_chunk_with_qrcodes(chunk)
-            if success:
-                posted_proxies.extend(chunk)
-                if (i + proxies_per_post) < len(proxies_to_post):
-                    if self.runtime.is_time_exceeded():
-                        self.log.warning("Stopping posting due to execution time limit (before delay).")
-                        break
-                    self.log.info(f"Waiting {delay_seconds} seconds before next post...")
-                    time.sleep(delay_seconds)
-            else:
-                self.log.warning(f"Failed to post chunk. Skipping to next.")
-        
+        # QR codes for the next chunk are rendered in the background during the delay.
+        prefetched_qr_codes: Optional[Future] = None
+
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            for i in range(0, len(proxies_to_post), proxies_per_post):
+                if self.runtime.is_time_exceeded():
+                    self.log.warning("Stopping posting due to execution time limit.")
+                    break
+
+                chunk = proxies_to_post[i:i + proxies_per_post]
+                self.log.info(f"Processing chunk {i // proxies_per_post + 1}...")
+
+                qr_buffers = prefetched_qr_codes.result() if prefetched_qr_codes else None
+                prefetched_qr_codes = None
+                success = self._post_chunk_with_qrcodes(chunk, qr_buffers)
+                if success:
+                    posted_proxies.extend(chunk)
+                    if (i + proxies_per_post) < len(proxies_to_post):
+                        if self.runtime.is_time_exceeded():
+                            self.log.warning("Stopping posting due to execution time limit (before delay).")
+                            break
+                        next_chunk = proxies_to_post[i + proxies_per_post:i + 2 * proxies_per_post]
+                        prefetched_qr_codes = prefetcher.submit(self._generate_qr_codes, next_chunk)
+                        self.log.info(f"Waiting {delay_seconds} seconds before next post...")
+                        time.sleep(delay_seconds)
+                else:
+                    self.log.warning(f"Failed to post chunk. Skipping to next.")
+
         self.log.info(f"Finished posting. Total proxies successfully posted: {len(posted_proxies)}")
         return posted_proxies
 
@@ -522,11 +766,12 @@ class TelegramPoster:
 # ================================================================
 
 class ArchiveManager:
-    """Handles saving the updated archive file."""
-    def __init__(self, config: Dict[str, Any], log: logging.Logger):
+    """Handles appending newly posted proxies to the JSON Lines archive file."""
+    def __init__(self, config: Dict[str, Any], log: logging.Logger, archive: Archive):
         self.config = config
         self.log = log
-        self.archive_path = Path(self.config['paths']['archive'])
+        self.archive = archive
+        self.archive_path = archive.path
 
     def update_archive(self, posted_proxies: List[Dict[str, Any]]):
         """Adds newly posted proxies to the archive file."""
@@ -536,22 +781,26 @@ class ArchiveManager:
             return
 
         self.archive_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        existing_proxies = []
-        if self.archive_path.exists():
-            try:
-                with self.archive_path.open('r', encoding='utf-8') as f:
-                    existing_proxies = json.load(f)
-            except (json.JSONDecodeError, IOError):
-                self.log.error(f"Could not read existing archive file. It will be overwritten.")
 
-        updated_archive = existing_proxies + posted_proxies
-        final_archive = list({p['tg_link']: p for p in updated_archive}.values())
+        new_entries = {
+            p['tg_link']: p for p in posted_proxies
+            if p.get('tg_link') and p['tg_link'] not in self.archive.links
+        }
+        if not new_entries:
+            self.log.info("All posted proxies are already archived, archive remains unchanged.")
+            return
+        lines = b''.join(_json_dumps(p) + b'\n' for p in new_entries.values())
 
         try:
-            with self.archive_path.open('w', encoding='utf-8') as f:
-                json.dump(final_archive, f, indent=4, ensure_ascii=False)
-            self.log.info(f"Successfully updated archive with {len(posted_proxies)} new proxies. Total in archive: {len(final_archive)}")
+            with self.archive_path.open('a+b') as f:
+                # Terminate a partial last line left by an interrupted write before appending.
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        lines = b'\n' + lines
+                f.write(lines)
+            self.archive.links.update(new_entries)
+            self.log.info(f"Successfully appended {len(new_entries)} new proxies to the archive. Total in archive: {len(self.archive.links)}")
         except IOError as e:
             self.log.error(f"Failed to write to archive file '{self.archive_path}': {e}")
 
@@ -570,13 +819,15 @@ def main():
         config = config_manager.load()
         runtime_manager = RuntimeManager(start_time, config, log)
 
+        archive = Archive.load(Path(config['paths']['archive']), log)
+
         data_loader = DataLoader(config, log, runtime_manager)
         fetched_proxies = data_loader.fetch_proxies()
         if not fetched_proxies:
             self.log.info("No proxies were fetched. Exiting.")
             return
 
-        processor = ProxyProcessor(config, log)
+        processor = ProxyProcessor(config, log, archive)
         new_proxies = processor.find_new_proxies(fetched_proxies)
         if not new_proxies:
             self.log.info("No new proxies found after filtering. Exiting.")
@@ -585,7 +836,7 @@ def main():
         poster = TelegramPoster(config, log, runtime_manager)
         posted_proxies = poster.post_all(new_proxies)
 
-        archive_manager = ArchiveManager(config, log)
+        archive_manager = ArchiveManager(config, log, archive)
         archive_manager.update_archive(posted_proxies)
 
     except Exception as e:
@@ -594,5 +845,21 @@ def main():
         elapsed_time = time.time() - start_time
         log.info(f"====== Pipeline Finished in {elapsed_time:.2f} seconds ======")
 
+def profile_main(output_path: Path, top: int = 30):
+    """
+    Runs the pipeline under cProfile, saves the raw stats and prints the top entries.
+
+    Enabled with the PROFILE environment variable, this shows whether a run is
+    dominated by network I/O or by JSON and string processing.
+    """
+    with cProfile.Profile() as profiler:
+        main()
+    profiler.dump_stats(output_path)
+    pstats.Stats(profiler, stream=sys.stdout).sort_stats('cumulative').print_stats(top)
+    print(f"Profile data saved to '{output_path}'.")
+
 if __name__ == "__main__":
-    main()
+    if os.environ.get('PROFILE'):
+        profile_main(Path(os.environ.get('PROFILE_OUTPUT', 'prof.out')))
+    else:
+        main()